@@ -1,8 +1,52 @@
+import codecs
+import functools
 import json
+import mmap
 import os
 import re
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 匹配完整的SRT字幕块：序号行（允许前导空白）、时间行以及随后的文本（直到空行或文件结尾）
+# 直接在原始字节上匹配，时间拆分为 时:分:秒 和两位毫秒，小时去掉前导0，便于直接拼成ASS时间格式
+_SRT_BLOCK_RE = re.compile(
+    rb'^(?:\xef\xbb\xbf)?[ \t]*\d+[ \t]*\r?\n'
+    rb'0?(\d+:\d{2}:\d{2}),(\d{2})\d\s*-->\s*0?(\d+:\d{2}:\d{2}),(\d{2})\d[^\n]*\n'
+    rb'(?=[ \t]*\S)(.*?)[ \t\r]*(?=\n\s*\n|\s*\Z)',
+    re.M | re.S
+)
+
+# 各样式附带的动画特效标签
+_EFFECT_PREFIX = {
+    "霓虹发光": "{\\blur2\\be1}",  # 发光效果
+    "彩虹渐变": "{\\t(0,1000,\\c&H0080FF&)\\t(1000,2000,\\c&HFF8000&)\\t(2000,3000,\\c&H8000FF&)}",  # 颜色变化效果
+    "可爱卡通": "{\\t(0,200,\\fscx120\\fscy120)\\t(200,400,\\fscx100\\fscy100)}",  # 弹跳效果
+    "火焰橙红": "{\\t(0,500,\\alpha&H00&)\\t(500,1000,\\alpha&H80&)\\t(1000,1500,\\alpha&H00&)}",  # 闪烁效果
+}
+
+# ASS文件头部中与样式无关的固定部分
+_ASS_SCRIPT_INFO = (
+    "[Script Info]\n"
+    "Title: 转换自SRT字幕\n"
+    "ScriptType: v4.00+\n"
+    "WrapStyle: 0\n"
+    "ScaledBorderAndShadow: yes\n"
+    "YCbCr Matrix: TV.709\n"
+    "PlayResX: 1920\n"
+    "PlayResY: 1080\n\n"
+    "[V4+ Styles]\n"
+    "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+)
+_ASS_EVENTS_HEADER = (
+    "\n[Events]\n"
+    "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+)
 
 
 class ASSConverter:
@@ -15,12 +59,21 @@ class ASSConverter:
         """
         self.config_path = config_path
         self.config = self._load_config()
+        self.styles: Dict[str, Dict[str, Any]] = self.config.get("styles", {})
+
+        # 预先格式化所有样式行和内部名称，转换时直接查表
+        self._style_line_cache = {key: self._format_style_line(style_config)
+                                  for key, style_config in self.styles.items()}
+        self._style_internal_name = {key: style_config.get("name", key)
+                                     for key, style_config in self.styles.items()}
+        # 单样式文件头部缓存，配置加载后不再变化
+        self._header_cache: Dict[str, str] = {}
 
     def _load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(self.config_path, 'rb') as f:
+                return _json_loads(f.read())
         except FileNotFoundError:
             raise FileNotFoundError(f"配置文件 {self.config_path} 未找到")
         except json.JSONDecodeError:
@@ -33,7 +86,7 @@ class ASSConverter:
         Returns:
             样式名称列表
         """
-        return list(self.config.get("styles", {}).keys())
+        return list(self.styles.keys())
 
     def get_style_names(self) -> List[str]:
         """
@@ -42,32 +95,7 @@ class ASSConverter:
         Returns:
             样式内部名称列表
         """
-        styles = self.config.get("styles", {})
-        return [style_config.get("name", key) for key, style_config in styles.items()]
-
-    def _parse_srt_time(self, time_str: str) -> str:
-        """
-        将SRT时间格式转换为ASS时间格式
-        SRT: 00:00:01,000 -> ASS: 0:00:01.00
-
-        Args:
-            time_str: SRT格式的时间字符串
-
-        Returns:
-            ASS格式的时间字符串
-        """
-        # 将逗号替换为点，并去掉最后一位毫秒
-        time_str = time_str.replace(',', '.')
-        # 移除小时前的0和毫秒的最后一位
-        parts = time_str.split(':')
-        hour = str(int(parts[0]))  # 移除前导0
-        minute = parts[1]
-        sec_ms = parts[2]
-        if '.' in sec_ms:
-            sec, ms = sec_ms.split('.')
-            ms = ms[:2]  # 只取前两位毫秒
-            return f"{hour}:{minute}:{sec}.{ms}"
-        return f"{hour}:{minute}:{sec_ms}.00"
+        return [style_config.get("name", key) for key, style_config in self.styles.items()]
 
     def _parse_srt_file(self, srt_path: str) -> List[Dict[str, str]]:
         """
@@ -79,44 +107,35 @@ class ASSConverter:
         Returns:
             字幕数据列表
         """
-        subtitles = []
-
-        try:
-            with open(srt_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            # 尝试其他编码
+        # 以只读方式映射文件，正则直接在映射的字节上扫描，只解码捕获到的文本
+        with open(srt_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # UTF-16无法按字节匹配，先整体转成UTF-8
+                if mm[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+                    blocks = _SRT_BLOCK_RE.findall(mm[:].decode('utf-16').encode('utf-8'))
+                else:
+                    blocks = _SRT_BLOCK_RE.findall(mm)
+
+        # 按常见编码依次尝试解码字幕文本
+        raw_texts = [block[4] for block in blocks]
+        for encoding in ('utf-8', 'gbk', 'latin-1'):
             try:
-                with open(srt_path, 'r', encoding='gbk') as f:
-                    content = f.read()
+                texts = [text.decode(encoding) for text in raw_texts]
+                break
             except UnicodeDecodeError:
-                with open(srt_path, 'r', encoding='latin-1') as f:
-                    content = f.read()
-
-        # 分割字幕块
-        blocks = re.split(r'\n\s*\n', content.strip())
-
-        for block in blocks:
-            lines = block.strip().split('\n')
-            if len(lines) < 3:
                 continue
 
-            # 解析时间行
-            time_match = re.match(r'(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})', lines[1])
-            if not time_match:
-                continue
-
-            start_time = self._parse_srt_time(time_match.group(1))
-            end_time = self._parse_srt_time(time_match.group(2))
-
-            # 合并字幕文本
-            text = '\\N'.join(lines[2:])  # ASS中用\N表示换行
-
-            subtitles.append({
-                'start': start_time,
-                'end': end_time,
-                'text': text
-            })
+        # SRT时间 HH:MM:SS,mmm 直接拼成ASS时间 H:MM:SS.cc
+        subtitles = [
+            {
+                'start': (b'%s.%s' % (hms1, cs1)).decode('ascii'),
+                'end': (b'%s.%s' % (hms2, cs2)).decode('ascii'),
+                'text': text.replace('\r\n', '\\N').replace('\n', '\\N')  # ASS中用\N表示换行
+            }
+            for (hms1, cs1, hms2, cs2, _), text in zip(blocks, texts)
+        ]
 
         return subtitles
 
@@ -130,29 +149,31 @@ class ASSConverter:
         Returns:
             ASS文件头部字符串
         """
-        header = "[Script Info]\n"
-        header += "Title: 转换自SRT字幕\n"
-        header += "ScriptType: v4.00+\n"
-        header += "WrapStyle: 0\n"
-        header += "ScaledBorderAndShadow: yes\n"
-        header += "YCbCr Matrix: TV.709\n"
-        header += "PlayResX: 1920\n"
-        header += "PlayResY: 1080\n\n"
-
-        header += "[V4+ Styles]\n"
-        header += "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+        header = [_ASS_SCRIPT_INFO]
 
         # 添加选中的样式
-        style_configs = self.config.get("styles", {})
         for style_name in styles:
-            if style_name in style_configs:
-                style_config = style_configs[style_name]
-                style_line = self._format_style_line(style_config)
-                header += style_line + "\n"
+            style_line = self._style_line_cache.get(style_name)
+            if style_line is not None:
+                header.append(style_line + "\n")
+
+        header.append(_ASS_EVENTS_HEADER)
 
-        header += "\n[Events]\n"
-        header += "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+        return ''.join(header)
 
+    def _get_style_header(self, style_name: str) -> str:
+        """
+        获取单个样式的ASS文件头部（带缓存）
+
+        Args:
+            style_name: 样式名称
+
+        Returns:
+            ASS文件头部字符串
+        """
+        header = self._header_cache.get(style_name)
+        if header is None:
+            header = self._header_cache.setdefault(style_name, self._generate_ass_header([style_name]))
         return header
 
     def _format_style_line(self, style_config: Dict[str, Any]) -> str:
@@ -165,10 +186,11 @@ class ASSConverter:
         Returns:
             格式化的样式行
         """
-        bold = -1 if style_config.get("bold", False) else 0
-        italic = -1 if style_config.get("italic", False) else 0
-        underline = -1 if style_config.get("underline", False) else 0
-        strikeout = -1 if style_config.get("strikeout", False) else 0
+        # ASS中 -1 表示开启，0 表示关闭
+        bold = -bool(style_config.get("bold"))
+        italic = -bool(style_config.get("italic"))
+        underline = -bool(style_config.get("underline"))
+        strikeout = -bool(style_config.get("strikeout"))
 
         return (f"Style: {style_config.get('name', 'Default')},"
                 f"{style_config.get('fontname', '微软雅黑')},"
@@ -191,32 +213,46 @@ class ASSConverter:
                 f"{style_config.get('margin_v', 10)},"
                 f"{style_config.get('encoding', 1)}")
 
-    def _apply_effects(self, text: str, style_name: str) -> str:
+    def _effect_prefix(self, style_name: str) -> str:
         """
-        应用特效到文本
+        获取样式对应的特效标签前缀
 
         Args:
-            text: 原始文本
             style_name: 样式名称
 
         Returns:
-            应用特效后的文本
+            特效标签字符串，没有特效时返回空字符串
+        """
+        return _EFFECT_PREFIX.get(style_name, "")
+
+    def _write_style_file(self, style_name: str, events: List[Tuple[str, str]],
+                          srt_filename: str, output_dir: str) -> str:
+        """
+        使用单个样式生成ASS文件
+
+        Args:
+            style_name: 样式名称
+            events: 预先格式化的事件行片段列表，每项为 (行首含时间部分, 文本及换行)
+            srt_filename: 输出文件名前缀
+            output_dir: 输出目录
+
+        Returns:
+            生成的ASS文件路径
         """
-        # 根据样式添加一些动画效果
-        if "霓虹发光" in style_name:
-            # 添加发光效果
-            text = f"{{\\blur2\\be1}}{text}"
-        elif "彩虹渐变" in style_name:
-            # 添加颜色变化效果
-            text = f"{{\\t(0,1000,\\c&H0080FF&)\\t(1000,2000,\\c&HFF8000&)\\t(2000,3000,\\c&H8000FF&)}}{text}"
-        elif "可爱卡通" in style_name:
-            # 添加弹跳效果
-            text = f"{{\\t(0,200,\\fscx120\\fscy120)\\t(200,400,\\fscx100\\fscy100)}}{text}"
-        elif "火焰橙红" in style_name:
-            # 添加闪烁效果
-            text = f"{{\\t(0,500,\\alpha&H00&)\\t(500,1000,\\alpha&H80&)\\t(1000,1500,\\alpha&H00&)}}{text}"
-
-        return text
+        # 事件行中间的 样式名,,0,0,0,,特效前缀 只与样式有关，预先拼好
+        style_fragment = (f",{self._style_internal_name[style_name]},,0,0,0,,"
+                          f"{self._effect_prefix(style_name)}")
+
+        # 生成输出文件路径
+        output_filename = f"{srt_filename}_{style_name}.ass"
+        output_path = os.path.join(output_dir, output_filename)
+
+        # 写入单个样式的文件头部，再把字幕事件逐行流式写入（所有字幕都使用同一个样式）
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write(self._get_style_header(style_name))
+            f.writelines(head + style_fragment + tail for head, tail in events)
+
+        return output_path
 
     def srt_to_ass(self, style_names: List[str], srt_path: str, output_dir: str = "output") -> List[str]:
         """
@@ -233,67 +269,62 @@ class ASSConverter:
         if not style_names:
             raise ValueError("至少需要选择一个样式")
 
-        # 验证样式名称
-        available_styles = self.get_style_list()
-        for style_name in style_names:
-            if style_name not in available_styles:
-                raise ValueError(f"样式 '{style_name}' 不存在，可用样式: {available_styles}")
+        # 验证样式名称，一次列出所有不存在的样式
+        missing_styles = [style_name for style_name in style_names if style_name not in self.styles]
+        if missing_styles:
+            missing = "', '".join(missing_styles)
+            raise ValueError(f"样式 '{missing}' 不存在，可用样式: {self.get_style_list()}")
 
         # 解析SRT文件
         subtitles = self._parse_srt_file(srt_path)
         if not subtitles:
             raise ValueError("SRT文件中没有找到有效的字幕")
 
+        # 与样式无关的时间和文本部分只格式化一次，所有样式共用
+        events = [(f"Dialogue: 0,{subtitle['start']},{subtitle['end']}", f"{subtitle['text']}\n")
+                  for subtitle in subtitles]
+
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
 
         # 生成输出文件名前缀
         srt_filename = os.path.splitext(os.path.basename(srt_path))[0]
 
-        output_paths = []
-        style_configs = self.config.get("styles", {})
-
-        # 为每个样式生成单独的ASS文件
-        for style_name in style_names:
-            # 生成单个样式的ASS文件头部
-            ass_content = self._generate_ass_header([style_name])
-
-            # 获取当前样式配置
-            current_style_config = style_configs[style_name]
-            style_internal_name = current_style_config.get("name", style_name)
+        # 为每个样式生成单独的ASS文件，各文件互不依赖，并发写入
+        with ThreadPoolExecutor(max_workers=min(8, len(style_names))) as executor:
+            output_paths = list(executor.map(
+                lambda style_name: self._write_style_file(style_name, events, srt_filename, output_dir),
+                style_names
+            ))
 
-            # 添加字幕事件（所有字幕都使用同一个样式）
-            for subtitle in subtitles:
-                # 应用特效
-                text = self._apply_effects(subtitle['text'], style_name)
+        return output_paths
 
-                # 格式化事件行
-                event_line = (f"Dialogue: 0,{subtitle['start']},{subtitle['end']},"
-                              f"{style_internal_name},,0,0,0,,{text}\n")
-                ass_content += event_line
 
-            # 生成输出文件路径
-            output_filename = f"{srt_filename}_{style_name}.ass"
-            output_path = os.path.join(output_dir, output_filename)
+# 便捷函数
+@functools.lru_cache(maxsize=4)
+def _get_converter(config_path: str, mtime: float) -> ASSConverter:
+    """按配置文件路径和修改时间缓存转换器，配置未修改时不再重复解析"""
+    return ASSConverter(config_path)
 
-            # 写入文件
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(ass_content)
 
-            output_paths.append(output_path)
+def _cached_converter(config_path: str) -> ASSConverter:
+    """获取缓存的转换器，配置文件修改后会自动重新加载"""
+    try:
+        mtime = os.path.getmtime(config_path)
+    except OSError:
+        # 交给ASSConverter抛出统一的"配置文件未找到"错误
+        mtime = None
+    return _get_converter(config_path, mtime)
 
-        return output_paths
 
-
-# 便捷函数
 def get_available_styles(config_path: str = "config/ass_config.json") -> List[str]:
     """获取可用样式列表"""
-    converter = ASSConverter(config_path)
+    converter = _cached_converter(config_path)
     return converter.get_style_list()
 
 
 def convert_srt_to_ass(style_names: List[str], srt_path: str, output_dir: str = "output",
                       config_path: str = "config/ass_config.json") -> List[str]:
     """转换SRT到ASS"""
-    converter = ASSConverter(config_path)
-    return converter.srt_to_ass(style_names, srt_path, output_dir)
\ No newline at end of file
+    converter = _cached_converter(config_path)
+    return converter.srt_to_ass(style_names, srt_path, output_dir)
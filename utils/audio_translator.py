@@ -1,58 +1,114 @@
 import os
+import asyncio
+import glob
+import io
 import math
 import subprocess
 import json
 import re
-import time
-from typing import List, Dict
-from openai import OpenAI
-from .subtitle_translator import SubtitleTranslator
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, AsyncIterator, Tuple
+from openai import AsyncOpenAI
+from .subtitle_translator import DEFAULT_CACHE_PATH, SubtitleTranslator
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# FFmpeg检查与PATH设置在进程内只需做一次，避免每次创建AudioTranslator都启动子进程
+_FFMPEG_OK = False  # 只缓存检查成功的结果，失败时下次仍会重新检查
+_FFMPEG_PATH_SET = False
 
 
 class AudioTranslator:
-    def __init__(self, api_key: str):
-        """音频转字幕翻译器"""
-        self.client = OpenAI(api_key=api_key)
-        self.subtitle_translator = SubtitleTranslator()
+    def __init__(self, api_key: str, cache_path: str = DEFAULT_CACHE_PATH):
+        """音频转字幕翻译器，cache_path为翻译缓存数据库路径，None表示不落盘"""
+        self.api_key = api_key
+        self.subtitle_translator = SubtitleTranslator(cache_path=cache_path)
+        # ffprobe结果缓存，键为(视频路径, 修改时间)
+        self._probe_cache: Dict[Tuple[str, float], Dict] = {}
         self._setup_ffmpeg_path()
 
     def _setup_ffmpeg_path(self):
         """设置FFmpeg路径"""
+        global _FFMPEG_PATH_SET
+        if _FFMPEG_PATH_SET:
+            return
+        _FFMPEG_PATH_SET = True
+
         # 获取当前脚本所在目录的ffmpeg路径
         current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         ffmpeg_bin = os.path.join(current_dir, "ffmpeg", "bin")
 
-        if os.path.exists(ffmpeg_bin) and ffmpeg_bin not in os.environ.get('PATH', ''):
-            os.environ['PATH'] = ffmpeg_bin + os.pathsep + os.environ.get('PATH', '')
+        path = os.environ.get('PATH', '')
+        if os.path.exists(ffmpeg_bin) and ffmpeg_bin not in path:
+            os.environ['PATH'] = ffmpeg_bin + os.pathsep + path
             print(f"设置FFmpeg路径: {ffmpeg_bin}")
 
     def check_ffmpeg(self):
         """检查FFmpeg是否可用"""
+        global _FFMPEG_OK
+        if _FFMPEG_OK:
+            return True
+
         try:
-            result = subprocess.run(['ffmpeg', '-version'],
-                                    capture_output=True, text=True,
-                                    encoding='utf-8', errors='ignore', timeout=10)
-            return result.returncode == 0
+            result = subprocess.run(['ffmpeg', '-version'], capture_output=True, timeout=10)
+            _FFMPEG_OK = result.returncode == 0
+            return _FFMPEG_OK
         except Exception as e:
             print(f"检查FFmpeg失败: {e}")
             return False
 
-    def get_video_duration(self, video_path: str) -> float:
-        """获取视频时长"""
-        cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', video_path]
+    def _probe(self, video_path: str) -> Dict:
+        """运行一次ffprobe获取格式和流信息，按(路径, 修改时间)缓存"""
+        try:
+            cache_key = (video_path, os.path.getmtime(video_path))
+        except OSError as e:
+            print(f"读取视频文件信息失败: {e}")
+            return None
+
+        if cache_key in self._probe_cache:
+            return self._probe_cache[cache_key]
+
+        cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', video_path]
 
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True,
-                                    encoding='utf-8', errors='ignore', timeout=30)
+            # 以字节读取输出，JSON解析器直接处理UTF-8字节，避免先解码成字符串
+            result = subprocess.run(cmd, capture_output=True, timeout=30)
+
             if result.returncode != 0:
-                print(f"获取视频时长失败，返回码: {result.returncode}")
+                print(f"ffprobe执行失败，返回码: {result.returncode}")
+                if result.stderr:
+                    print(f"错误信息: {result.stderr.decode('utf-8', errors='ignore')}")
                 return None
 
             if not result.stdout.strip():
-                print("ffprobe未返回视频格式信息")
+                print("ffprobe未返回任何输出")
                 return None
 
-            info = json.loads(result.stdout)
+            info = _json_loads(result.stdout)
+
+        except json.JSONDecodeError as e:
+            print(f"解析视频信息JSON时出错: {e}")
+            print(f"ffprobe输出: {result.stdout[:500].decode('utf-8', errors='ignore')}")
+            return None
+        except Exception as e:
+            print(f"获取视频信息失败: {e}")
+            return None
+
+        self._probe_cache[cache_key] = info
+        return info
+
+    def get_video_duration(self, video_path: str) -> float:
+        """获取视频时长"""
+        info = self._probe(video_path)
+        if info is None:
+            return None
+
+        try:
             duration = info.get('format', {}).get('duration')
             if duration:
                 return float(duration)
@@ -60,10 +116,7 @@ class AudioTranslator:
                 print("无法从视频信息中获取时长")
                 return None
 
-        except json.JSONDecodeError as e:
-            print(f"解析视频信息JSON时出错: {e}")
-            return None
-        except Exception as e:
+        except (TypeError, ValueError) as e:
             print(f"获取视频时长失败: {e}")
             return None
 
@@ -76,132 +129,144 @@ class AudioTranslator:
 
         # 创建临时音频目录
         output_dir = "temp_audio"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+
+        # 清理上次运行残留的分段文件，避免混入本次结果
+        for stale_path in glob.glob(os.path.join(output_dir, "chunk_*.mp3")):
+            os.remove(stale_path)
 
         num_chunks = math.ceil(total_duration / chunk_duration)
         audio_chunks = []
 
         print(f"视频总时长: {total_duration:.1f}秒，将分割为 {num_chunks} 段")
 
-        for i in range(num_chunks):
+        # 使用segment封装器一次完成解码和分段，避免每段都重新启动ffmpeg并解封装视频
+        cmd = [
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0', '-i', video_path,
+            '-vn', '-acodec', 'mp3', '-ar', '16000', '-ac', '1',
+            '-f', 'segment', '-segment_time', str(chunk_duration), '-reset_timestamps', '1',
+            '-y', os.path.join(output_dir, "chunk_%03d.mp3")
+        ]
+
+        try:
+            print(f"正在提取音频，共 {num_chunks} 段...")
+            # 输出保持为字节，只在失败需要打印时才解码stderr
+            result = subprocess.run(cmd, capture_output=True, timeout=60 * num_chunks)
+
+            if result.returncode != 0:
+                print(f"音频提取失败，返回码: {result.returncode}")
+                if result.stderr:
+                    print(f"  错误信息: {result.stderr.decode('utf-8', errors='ignore')}")
+                return []
+
+        except Exception as e:
+            print(f"提取音频失败: {e}")
+            return []
+
+        for chunk_path in sorted(glob.glob(os.path.join(output_dir, "chunk_*.mp3"))):
+            # 根据文件名中的序号推算该段在视频中的起止时间
+            i = int(os.path.splitext(os.path.basename(chunk_path))[0].split('_')[1])
             start_time = i * chunk_duration
             end_time = min((i + 1) * chunk_duration, total_duration)
-            duration = end_time - start_time
-
-            chunk_path = os.path.join(output_dir, f"chunk_{i:03d}.mp3")
-
-            cmd = [
-                'ffmpeg', '-i', video_path,
-                '-ss', str(start_time), '-t', str(duration),
-                '-vn', '-acodec', 'mp3', '-ar', '16000', '-ac', '1',
-                '-y', chunk_path
-            ]
-
-            try:
-                print(f"提取音频段 {i + 1}/{num_chunks}: {start_time:.1f}s - {end_time:.1f}s")
-                result = subprocess.run(cmd, capture_output=True, text=True,
-                                        encoding='utf-8', errors='ignore', timeout=60)
-
-                if result.returncode == 0 and os.path.exists(chunk_path):
-                    file_size = os.path.getsize(chunk_path)
-                    if file_size > 1000:  # 文件大小大于1KB才认为有效
-                        audio_chunks.append({
-                            'path': chunk_path,
-                            'start_time': start_time,
-                            'end_time': end_time,
-                            'chunk_index': i
-                        })
-                    else:
-                        print(f"  音频段 {i + 1} 文件过小，跳过")
-                        if os.path.exists(chunk_path):
-                            os.remove(chunk_path)
-                else:
-                    print(f"  音频段 {i + 1} 提取失败，返回码: {result.returncode}")
-                    if result.stderr:
-                        print(f"  错误信息: {result.stderr}")
 
-            except Exception as e:
-                print(f"提取音频段 {i + 1} 失败: {e}")
-                continue
+            file_size = os.path.getsize(chunk_path)
+            if file_size > 1000:  # 文件大小大于1KB才认为有效
+                print(f"音频段 {i + 1}/{num_chunks}: {start_time:.1f}s - {end_time:.1f}s")
+                audio_chunks.append({
+                    'path': chunk_path,
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'chunk_index': i
+                })
+            else:
+                print(f"  音频段 {i + 1} 文件过小，跳过")
+                os.remove(chunk_path)
 
         print(f"成功提取 {len(audio_chunks)} 个有效音频段")
         return audio_chunks
 
-    def transcribe_audio_chunk(self,audio_model:str, audio_path: str, chunk_start_time: float) -> List[Dict]:
+    async def transcribe_audio_chunk(self, client: AsyncOpenAI, audio_model: str, audio_path: str,
+                                     chunk_start_time: float) -> List[Dict]:
         """转录单个音频段"""
         try:
-            with open(audio_path, "rb") as audio_file:
-                transcription = self.client.audio.transcriptions.create(
-                    model=audio_model,
-                    file=audio_file,
-                    response_format="verbose_json",
-                    timestamp_granularities=["segment"]
-                )
-
-                segments = []
-                if hasattr(transcription, 'segments') and transcription.segments:
-                    for segment in transcription.segments:
-                        start_time = chunk_start_time + segment.start
-                        end_time = chunk_start_time + segment.end
-                        text = segment.text.strip()
-
-                        if text:
-                            segments.append({
-                                'start_time': start_time,
-                                'end_time': end_time,
-                                'text': text
-                            })
-
-                return segments
+            # 音频段通常只有几百KB到几MB，一次读入内存，上传时不再对文件反复小块读取
+            with open(audio_path, "rb") as f:
+                audio_file = io.BytesIO(f.read())
+            audio_file.name = os.path.basename(audio_path)  # SDK使用name作为上传的文件名
+
+            transcription = await client.audio.transcriptions.create(
+                model=audio_model,
+                file=audio_file,
+                response_format="verbose_json",
+                timestamp_granularities=["segment"]
+            )
+
+            segments = []
+            if hasattr(transcription, 'segments') and transcription.segments:
+                for segment in transcription.segments:
+                    start_time = chunk_start_time + segment.start
+                    end_time = chunk_start_time + segment.end
+                    text = segment.text.strip()
+
+                    if text:
+                        segments.append({
+                            'start_time': start_time,
+                            'end_time': end_time,
+                            'text': text
+                        })
+
+            return segments
 
         except Exception as e:
             print(f"转录音频失败: {e}")
             return []
 
-    def detect_embedded_subtitles(self, video_path: str) -> List[Dict]:
-        """检测视频内封字幕"""
-        cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', video_path]
-
-        try:
-            # 明确指定编码方式避免Windows编码问题
-            result = subprocess.run(cmd, capture_output=True, text=True,
-                                    encoding='utf-8', errors='ignore', timeout=30)
+    async def transcribe_audio_chunks(self, audio_model: str, audio_chunks: List[Dict],
+                                      max_workers: int = 8) -> AsyncIterator[List[Dict]]:
+        """并发转录所有音频段，按音频段顺序逐个产出转录结果"""
+        if not audio_chunks:
+            return
 
-            if result.returncode != 0:
-                print(f"ffprobe执行失败，返回码: {result.returncode}")
-                if result.stderr:
-                    print(f"错误信息: {result.stderr}")
-                return []
+        # 每段转录都是独立的网络请求，在同一事件循环中并发上传和等待，信号量限制同时进行的请求数
+        # 异步客户端绑定当前事件循环，因此每次运行单独创建并在结束时关闭
+        client = AsyncOpenAI(api_key=self.api_key)
+        semaphore = asyncio.Semaphore(max_workers)
 
-            if not result.stdout.strip():
-                print("ffprobe未返回任何输出")
-                return []
+        async def transcribe(chunk_info: Dict) -> List[Dict]:
+            async with semaphore:
+                return await self.transcribe_audio_chunk(client, audio_model,
+                                                         chunk_info['path'], chunk_info['start_time'])
 
-            info = json.loads(result.stdout)
-            subtitle_streams = []
+        tasks = [asyncio.create_task(transcribe(chunk_info)) for chunk_info in audio_chunks]
+        try:
+            for task in tasks:
+                yield await task or []
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await client.close()
 
-            for stream in info.get('streams', []):
-                if stream.get('codec_type') == 'subtitle':
-                    subtitle_streams.append({
-                        'index': stream.get('index'),
-                        'language': stream.get('tags', {}).get('language', 'unknown'),
-                        'codec': stream.get('codec_name', 'unknown'),
-                        'title': stream.get('tags', {}).get('title', '')
-                    })
+    def detect_embedded_subtitles(self, video_path: str) -> List[Dict]:
+        """检测视频内封字幕"""
+        info = self._probe(video_path)
+        if info is None:
+            return []
 
-            return subtitle_streams
+        subtitle_streams = []
+        for stream in info.get('streams', []):
+            if stream.get('codec_type') == 'subtitle':
+                subtitle_streams.append({
+                    'index': stream.get('index'),
+                    'language': stream.get('tags', {}).get('language', 'unknown'),
+                    'codec': stream.get('codec_name', 'unknown'),
+                    'title': stream.get('tags', {}).get('title', '')
+                })
 
-        except json.JSONDecodeError as e:
-            print(f"解析JSON时出错: {e}")
-            print(f"ffprobe输出: {result.stdout[:500] if 'result' in locals() else 'N/A'}")
-            return []
-        except Exception as e:
-            print(f"检测内封字幕时出错: {e}")
-            return []
+        return subtitle_streams
 
-    def extract_embedded_subtitles(self, video_path: str, output_path: str = None) -> str:
-        """提取内封字幕为SRT文件"""
+    def extract_embedded_subtitles(self, video_path: str) -> str:
+        """提取内封字幕，返回SRT内容"""
         subtitle_streams = self.detect_embedded_subtitles(video_path)
 
         if not subtitle_streams:
@@ -219,17 +284,12 @@ class AudioTranslator:
         selected_stream = subtitle_streams[0]
         stream_index = selected_stream['index']
 
-        # 设置输出路径
-        if not output_path:
-            base_name = os.path.splitext(os.path.basename(video_path))[0]
-            output_path = f"temp_{base_name}_extracted.srt"
-
-        # 提取字幕 - 使用流的绝对索引
+        # 提取字幕 - 使用流的绝对索引，SRT直接输出到stdout，不落临时文件
         cmd = [
-            'ffmpeg', '-i', video_path,
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-i', video_path,
             '-map', f'0:{stream_index}',  # 使用绝对流索引而不是字幕流索引
             '-c:s', 'srt',
-            '-y', output_path
+            '-f', 'srt', '-'
         ]
 
         try:
@@ -237,15 +297,13 @@ class AudioTranslator:
             result = subprocess.run(cmd, capture_output=True, text=True,
                                     encoding='utf-8', errors='ignore', timeout=60)
 
-            if result.returncode == 0 and os.path.exists(output_path):
-                # 检查生成的文件是否有内容
-                if os.path.getsize(output_path) > 0:
+            if result.returncode == 0:
+                # 检查输出是否有内容
+                if result.stdout.strip():
                     print("内封字幕提取成功")
-                    return output_path
+                    return result.stdout
                 else:
-                    print("字幕文件为空")
-                    if os.path.exists(output_path):
-                        os.remove(output_path)
+                    print("字幕内容为空")
                     return None
             else:
                 print(f"字幕提取失败，返回码: {result.returncode}")
@@ -259,10 +317,11 @@ class AudioTranslator:
 
     def seconds_to_srt_time(self, seconds: float) -> str:
         """将秒数转换为SRT时间格式"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        milliseconds = int((seconds % 1) * 1000)
+        # 先四舍五入到整毫秒再拆分，避免浮点误差把 179.9995 截断成 02:59,999
+        milliseconds = round(seconds * 1000)
+        secs, milliseconds = divmod(milliseconds, 1000)
+        minutes, secs = divmod(secs, 60)
+        hours, minutes = divmod(minutes, 60)
         return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
 
     def segments_to_srt_format(self, segments: List[Dict]) -> List[Dict]:
@@ -283,22 +342,180 @@ class AudioTranslator:
 
     def cleanup_temp_files(self, audio_chunks: List[Dict]):
         """清理临时文件"""
-        try:
-            for chunk_info in audio_chunks:
-                if os.path.exists(chunk_info['path']):
-                    os.remove(chunk_info['path'])
+        # 整个临时目录一次删除，上次运行中断残留的文件也一并清理
+        shutil.rmtree("temp_audio", ignore_errors=True)
 
-            temp_dir = "temp_audio"
-            if os.path.exists(temp_dir) and not os.listdir(temp_dir):
-                os.rmdir(temp_dir)
 
-        except Exception as e:
-            print(f"清理临时文件时出错: {e}")
+async def _transcribe_and_translate(translator: AudioTranslator, audio_chunks: List[Dict], api_key: str,
+                                    text_models: str, audio_models: str, translation_type: str,
+                                    batch_size: int, batch_min: int, max_workers: int) -> List[List[Dict]]:
+    """
+    转录与翻译流水线
+
+    在事件循环中并发转录各音频段，转录文本按音频段顺序跨段合并并去重，每凑满 batch_size 条
+    就交给翻译线程池，使转录和翻译的网络等待相互重叠，并避免段落很少的音频段
+    单独发起小批量或逐条翻译请求。翻译沿用同步的 SubtitleTranslator 及其限流器。
+
+    Returns:
+        与音频段一一对应的翻译后段落分组，无语音的音频段为空列表
+    """
+    loop = asyncio.get_running_loop()
+    segments = []  # 全部 (音频段序号, 段落)，按时间顺序
+    unique = {}  # 文本 -> 去重后的序号，相同文本只翻译一次
+    pending = []  # 尚未凑成整批的去重文本
+    futures = []  # 已提交的翻译批次
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit(batch_texts):
+            print(f"正在翻译第 {len(futures) + 1} 批次，包含 {len(batch_texts)} 条字幕...")
+            futures.append(loop.run_in_executor(
+                executor, translator.subtitle_translator.translate_texts,
+                api_key, text_models, batch_texts, translation_type, batch_min
+            ))
+
+        chunk_index = 0
+        async for segments_group in translator.transcribe_audio_chunks(audio_models, audio_chunks,
+                                                                       max_workers=max_workers):
+            if segments_group:
+                print(f"  第 {chunk_index + 1}/{len(audio_chunks)} 段获得 {len(segments_group)} 个语音段落")
+            else:
+                print(f"  第 {chunk_index + 1}/{len(audio_chunks)} 段无语音内容")
+
+            for segment in segments_group:
+                segments.append((chunk_index, segment))
+                if segment['text'] not in unique:
+                    unique[segment['text']] = len(unique)
+                    pending.append(segment['text'])
+
+            while len(pending) >= batch_size:
+                submit(pending[:batch_size])
+                pending = pending[batch_size:]
+            chunk_index += 1
+
+        # 剩余不足一批的文本
+        if pending:
+            submit(pending)
+
+        # 按提交顺序拼接译文
+        translated_unique = []
+        for translated_batch in await asyncio.gather(*futures):
+            translated_unique.extend(translated_batch)
+
+    # 格式化译文，放回各自所属的音频段
+    translated_segments_groups = [[] for _ in audio_chunks]
+    for chunk_index, segment in segments:
+        translated_segment = segment.copy()
+        translated_segment['text'] = translator.subtitle_translator.format_translated_subtitle(
+            segment['text'], translated_unique[unique[segment['text']]], translation_type
+        )
+        translated_segments_groups[chunk_index].append(translated_segment)
+
+    return translated_segments_groups
+
+
+class _GenerationAborted(Exception):
+    """处理流程提前结束，result 为 generate_subtitles 应返回给调用方的结果"""
+
+    def __init__(self, result=None):
+        super().__init__(result)
+        self.result = result
+
+
+def _do_embedded(translator: AudioTranslator, video_path: str, api_key: str, text_models: str,
+                 translation_type: str, batch_size: int, batch_min: int, max_workers: int) -> List[Dict]:
+    """翻译内封字幕，返回翻译后的字幕列表"""
+    # 检测内封字幕
+    embedded_subs = translator.detect_embedded_subtitles(video_path)
+    if not embedded_subs:
+        print("未检测到内封字幕，无法使用此模式")
+        raise _GenerationAborted("未检测到内封字幕，无法使用此模式")
+
+    # 提取内封字幕
+    srt_text = translator.extract_embedded_subtitles(video_path)
+    if not srt_text:
+        print("内封字幕提取失败")
+        raise _GenerationAborted("内封字幕提取失败")
+
+    # 解析SRT内容
+    subtitles = translator.subtitle_translator.parse_srt(srt_text)
+    if not subtitles:
+        print("字幕解析失败")
+        raise _GenerationAborted("字幕解析失败")
+
+    print(f"成功解析 {len(subtitles)} 条字幕")
+
+    # 翻译字幕
+    print("🌐 开始翻译字幕...")
+
+    # 提取文本进行翻译
+    texts = [sub['text'] for sub in subtitles]
+
+    # 分批并发翻译
+    translated_texts = translator.subtitle_translator.translate_batches(
+        api_key=api_key,
+        model=text_models,
+        texts=texts,
+        translation_type=translation_type,
+        batch_size=batch_size,
+        batch_min=batch_min,
+        max_workers=max_workers
+    )
+
+    # 格式化翻译结果
+    for i, subtitle in enumerate(subtitles):
+        if i < len(translated_texts):
+            formatted_text = translator.subtitle_translator.format_translated_subtitle(
+                subtitle['text'], translated_texts[i], translation_type
+            )
+            subtitle['text'] = formatted_text
+
+    return subtitles
+
+
+def _do_audio(translator: AudioTranslator, video_path: str, api_key: str, text_models: str,
+              audio_models: str, translation_type: str, batch_size: int, batch_min: int,
+              max_workers: int) -> List[Dict]:
+    """语音转录并翻译，返回翻译后的字幕列表"""
+    # 提取音频分段
+    audio_chunks = translator.extract_audio_chunks(video_path, chunk_duration=180)
+    if not audio_chunks:
+        print("音频提取失败")
+        raise _GenerationAborted()
+
+    # 转录与翻译流水线：某段转录完成后立即开始翻译，其余音频段继续并发转录
+    print(f"🎤 开始转录并翻译 {len(audio_chunks)} 个音频段...")
+    translated_segments_groups = asyncio.run(_transcribe_and_translate(
+        translator, audio_chunks, api_key, text_models, audio_models,
+        translation_type, batch_size, batch_min, max_workers
+    ))
+
+    # 检查是否有有效的转录结果
+    total_segments = sum(len(group) for group in translated_segments_groups)
+    if total_segments == 0:
+        print("未获得任何转录结果")
+        translator.cleanup_temp_files(audio_chunks)
+        raise _GenerationAborted()
+
+    print(f"转录翻译完成，共获得 {total_segments} 个语音段落，分布在 {len(translated_segments_groups)} 个音频段中")
+
+    # 合并所有翻译后的段落
+    all_translated_segments = []
+    for group in translated_segments_groups:
+        all_translated_segments.extend(group)
+
+    # 转换为SRT格式
+    srt_subtitles = translator.segments_to_srt_format(all_translated_segments)
+
+    # 清理临时文件
+    translator.cleanup_temp_files(audio_chunks)
+
+    return srt_subtitles
 
 
 def generate_subtitles(video_path: str, api_key: str, text_models:str,audio_models:str, output_path: str = "output",
                        mode: str = "auto", translation_type: str = "双语",
-                       batch_size: int = 10, batch_min: int = 3) -> str:
+                       batch_size: int = 10, batch_min: int = 3, max_workers: int = 8,
+                       cache_path: str = DEFAULT_CACHE_PATH) -> str:
     """
     生成视频字幕并翻译
 
@@ -310,6 +527,8 @@ def generate_subtitles(video_path: str, api_key: str, text_models:str,audio_mode
         translation_type: 翻译类型 ("双语", "英文", "中文")
         batch_size: 批量翻译大小
         batch_min: 最小批量大小
+        max_workers: 并发转录音频段、并发翻译批次的最大线程数
+        cache_path: 翻译缓存数据库路径，None表示只在内存中缓存
 
     Returns:
         生成的字幕文件路径，失败返回 None
@@ -321,7 +540,7 @@ def generate_subtitles(video_path: str, api_key: str, text_models:str,audio_mode
         return None
 
     # 创建翻译器
-    translator = AudioTranslator(api_key)
+    translator = AudioTranslator(api_key, cache_path=cache_path)
 
     # 检查FFmpeg
     if not translator.check_ffmpeg():
@@ -339,306 +558,43 @@ def generate_subtitles(video_path: str, api_key: str, text_models:str,audio_mode
         if mode == "只翻内封":
             # 模式1: 翻译内封字幕
             print("🔍 模式: 翻译内封字幕")
-
-            # 检测内封字幕
-            embedded_subs = translator.detect_embedded_subtitles(video_path)
-            if not embedded_subs:
-                print("未检测到内封字幕，无法使用此模式")
-                return "未检测到内封字幕，无法使用此模式"
-
-            # 提取内封字幕
-            temp_srt = translator.extract_embedded_subtitles(video_path)
-            if not temp_srt:
-                print("内封字幕提取失败")
-                return "内封字幕提取失败"
-
-            # 解析SRT文件
-            subtitles = translator.subtitle_translator.parse_srt(open(temp_srt, 'r', encoding='utf-8').read())
-            if not subtitles:
-                print("字幕解析失败")
-                # 清理临时文件
-                if os.path.exists(temp_srt):
-                    os.remove(temp_srt)
-                return "字幕解析失败"
-
-            print(f"成功解析 {len(subtitles)} 条字幕")
-
-            # 翻译字幕
-            print("🌐 开始翻译字幕...")
-
-            # 提取文本进行翻译
-            texts = [sub['text'] for sub in subtitles]
-
-            # 分批翻译
-            translated_texts = []
-            total_batches = (len(texts) + batch_size - 1) // batch_size
-
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i + batch_size]
-                current_batch = i // batch_size + 1
-
-                print(f"正在翻译第 {current_batch}/{total_batches} 批次，包含 {len(batch_texts)} 条字幕...")
-
-                # 使用我们之前写的翻译函数
-                if len(batch_texts) >= batch_min:
-                    translated_batch = translator.subtitle_translator.translate_texts_batch(
-                        api_key=api_key,
-                        model=text_models,
-                        texts=batch_texts,
-                        translation_type=translation_type
-                    )
-                else:
-                    # 如果批次太小，逐条翻译
-                    translated_batch = translator.subtitle_translator._translate_one_by_one(
-                        api_key=api_key,
-                        model=text_models,
-                        texts=batch_texts,
-                        translation_type=translation_type,
-                        max_retries=3
-                    )
-
-                translated_texts.extend(translated_batch)
-                time.sleep(0.5)  # 避免API请求过频
-
-            # 格式化翻译结果
-            for i, subtitle in enumerate(subtitles):
-                if i < len(translated_texts):
-                    formatted_text = translator.subtitle_translator.format_translated_subtitle(
-                        subtitle['text'], translated_texts[i], translation_type
-                    )
-                    subtitle['text'] = formatted_text
-
-            # 生成SRT文件
-            srt_content = translator.subtitle_translator.generate_srt(subtitles)
-
-            # 清理临时文件
-            if os.path.exists(temp_srt):
-                os.remove(temp_srt)
+            subtitles = _do_embedded(translator, video_path, api_key, text_models,
+                                     translation_type, batch_size, batch_min, max_workers)
 
         elif mode == "auto":
             # 模式2: 自动选择最佳方式
             print("🤖 模式: 自动选择")
 
-            # 先检查是否有内封字幕
-            embedded_subs = translator.detect_embedded_subtitles(video_path)
-
-            if embedded_subs:
+            # 先检查是否有内封字幕，有则直接复用当前翻译器走内封字幕流程
+            if translator.detect_embedded_subtitles(video_path):
                 print("检测到内封字幕，优先使用内封字幕翻译")
-                # 递归调用翻译内封字幕模式
-                return generate_subtitles(
-                    video_path=video_path,
-                    api_key=api_key,
-                    output_path=output_path,
-                    mode="只翻内封",
-                    translation_type=translation_type,
-                    batch_size=batch_size,
-                    batch_min=batch_min
-                )
-
-            # 没有内封字幕，使用语音转录
-            print("未检测到内封字幕，使用语音转录模式")
-            print("🎤 开始语音转录...")
-
-            # 提取音频分段
-            audio_chunks = translator.extract_audio_chunks(video_path, chunk_duration=180)
-            if not audio_chunks:
-                print("音频提取失败")
-                return None
-
-            # 转录所有音频段，保持分段结构
-            audio_segments_groups = []
-            for i, chunk_info in enumerate(audio_chunks):
-                print(f"🎤 转录第 {i + 1}/{len(audio_chunks)} 段...")
-
-                segments = translator.transcribe_audio_chunk(
-                    audio_models,
-                    chunk_info['path'],
-                    chunk_info['start_time'],
-
-                )
-
-                if segments:
-                    audio_segments_groups.append(segments)
-                    print(f"  获得 {len(segments)} 个语音段落")
-                else:
-                    print("  该段无语音内容")
-                    audio_segments_groups.append([])  # 保持分组结构
-
-            # 检查是否有有效的转录结果
-            total_segments = sum(len(group) for group in audio_segments_groups)
-            if total_segments == 0:
-                print("未获得任何转录结果")
-                translator.cleanup_temp_files(audio_chunks)
-                return None
-
-            print(f"转录完成，共获得 {total_segments} 个语音段落，分布在 {len(audio_segments_groups)} 个音频段中")
-
-            # 翻译转录结果 - 按音频段分批翻译
-            print("🌐 开始翻译转录文本...")
-
-            translated_segments_groups = []
-
-            for i, segments_group in enumerate(audio_segments_groups):
-                if not segments_group:  # 跳过空的分组
-                    translated_segments_groups.append([])
-                    continue
-
-                print(f"正在翻译第 {i + 1}/{len(audio_segments_groups)} 个音频段，包含 {len(segments_group)} 条字幕...")
-
-                # 提取当前音频段的文本
-                texts = [segment['text'] for segment in segments_group]
-
-                # 判断是否需要批量翻译还是逐条翻译
-                if len(texts) >= batch_min:
-                    translated_texts = translator.subtitle_translator.translate_texts_batch(
-                        api_key=api_key,
-                        model=text_models,
-                        texts=texts,
-                        translation_type=translation_type
-                    )
-                else:
-                    translated_texts = translator.subtitle_translator._translate_one_by_one(
-                        api_key=api_key,
-                        model=text_models,
-                        texts=texts,
-                        translation_type=translation_type,
-                        max_retries=3
-                    )
-
-                # 格式化翻译结果并保存
-                translated_segments = []
-                for j, segment in enumerate(segments_group):
-                    if j < len(translated_texts):
-                        formatted_text = translator.subtitle_translator.format_translated_subtitle(
-                            segment['text'], translated_texts[j], translation_type
-                        )
-
-                        translated_segment = segment.copy()
-                        translated_segment['text'] = formatted_text
-                        translated_segments.append(translated_segment)
-
-                translated_segments_groups.append(translated_segments)
-                time.sleep(0.5)  # 避免API请求过频
-
-            # 合并所有翻译后的段落
-            all_translated_segments = []
-            for group in translated_segments_groups:
-                all_translated_segments.extend(group)
-
-            # 转换为SRT格式
-            srt_subtitles = translator.segments_to_srt_format(all_translated_segments)
-
-            # 生成SRT内容
-            srt_content = translator.subtitle_translator.generate_srt(srt_subtitles)
-
-            # 清理临时文件
-            translator.cleanup_temp_files(audio_chunks)
+                subtitles = _do_embedded(translator, video_path, api_key, text_models,
+                                         translation_type, batch_size, batch_min, max_workers)
+            else:
+                # 没有内封字幕，使用语音转录
+                print("未检测到内封字幕，使用语音转录模式")
+                print("🎤 开始语音转录...")
+                subtitles = _do_audio(translator, video_path, api_key, text_models, audio_models,
+                                      translation_type, batch_size, batch_min, max_workers)
 
         elif mode == "只翻音频":
-            audio_chunks = translator.extract_audio_chunks(video_path, chunk_duration=180)
-            if not audio_chunks:
-                print("音频提取失败")
-                return None
-
-            # 转录所有音频段，保持分段结构
-            audio_segments_groups = []
-            for i, chunk_info in enumerate(audio_chunks):
-                print(f"🎤 转录第 {i + 1}/{len(audio_chunks)} 段...")
-
-                segments = translator.transcribe_audio_chunk(
-                    audio_models,
-                    chunk_info['path'],
-                    chunk_info['start_time']
-                )
-
-                if segments:
-                    audio_segments_groups.append(segments)
-                    print(f"  获得 {len(segments)} 个语音段落")
-                else:
-                    print("  该段无语音内容")
-                    audio_segments_groups.append([])  # 保持分组结构
-
-            # 检查是否有有效的转录结果
-            total_segments = sum(len(group) for group in audio_segments_groups)
-            if total_segments == 0:
-                print("未获得任何转录结果")
-                translator.cleanup_temp_files(audio_chunks)
-                return None
-
-            print(f"转录完成，共获得 {total_segments} 个语音段落，分布在 {len(audio_segments_groups)} 个音频段中")
-
-            # 翻译转录结果 - 按音频段分批翻译
-            print("🌐 开始翻译转录文本...")
-
-            translated_segments_groups = []
-
-            for i, segments_group in enumerate(audio_segments_groups):
-                if not segments_group:  # 跳过空的分组
-                    translated_segments_groups.append([])
-                    continue
-
-                print(f"正在翻译第 {i + 1}/{len(audio_segments_groups)} 个音频段，包含 {len(segments_group)} 条字幕...")
-
-                # 提取当前音频段的文本
-                texts = [segment['text'] for segment in segments_group]
-
-                # 判断是否需要批量翻译还是逐条翻译
-                if len(texts) >= batch_min:
-                    translated_texts = translator.subtitle_translator.translate_texts_batch(
-                        api_key=api_key,
-                        model=text_models,
-                        texts=texts,
-                        translation_type=translation_type
-                    )
-                else:
-                    translated_texts = translator.subtitle_translator._translate_one_by_one(
-                        api_key=api_key,
-                        model=text_models,
-                        texts=texts,
-                        translation_type=translation_type,
-                        max_retries=3
-                    )
-
-                # 格式化翻译结果并保存
-                translated_segments = []
-                for j, segment in enumerate(segments_group):
-                    if j < len(translated_texts):
-                        formatted_text = translator.subtitle_translator.format_translated_subtitle(
-                            segment['text'], translated_texts[j], translation_type
-                        )
-
-                        translated_segment = segment.copy()
-                        translated_segment['text'] = formatted_text
-                        translated_segments.append(translated_segment)
-
-                translated_segments_groups.append(translated_segments)
-                time.sleep(0.5)  # 避免API请求过频
-
-            # 合并所有翻译后的段落
-            all_translated_segments = []
-            for group in translated_segments_groups:
-                all_translated_segments.extend(group)
-
-            # 转换为SRT格式
-            srt_subtitles = translator.segments_to_srt_format(all_translated_segments)
-
-            # 生成SRT内容
-            srt_content = translator.subtitle_translator.generate_srt(srt_subtitles)
-
-            # 清理临时文件
-            translator.cleanup_temp_files(audio_chunks)
+            subtitles = _do_audio(translator, video_path, api_key, text_models, audio_models,
+                                  translation_type, batch_size, batch_min, max_workers)
 
         else:
             print(mode)
             return {'error':'没有这个选项'}
 
-        # 写入文件
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(srt_content)
+        # 写入文件：逐条写出字幕块，不在内存中拼出整个SRT字符串
+        with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.writelines(translator.subtitle_translator.generate_srt_iter(subtitles))
 
         print(f"✅ 字幕生成成功: {output_file}")
         return output_file
 
+    except _GenerationAborted as e:
+        return e.result
+
     except Exception as e:
         print(f"❌ 生成字幕时出错: {str(e)}")
         import traceback
@@ -3,27 +3,28 @@ import json
 from openai import OpenAI
 
 
+# 按 api_key 缓存的客户端，复用底层 HTTP 连接池
+_clients = {}
+
+
+def _get_client(api_key:str) -> OpenAI:
+    client = _clients.get(api_key)
+    if client is None:
+        client = _clients[api_key] = OpenAI(api_key=api_key)
+    return client
+
 
 def text_to_text(api_key:str, message:list, model:str):
-    client = OpenAI(api_key=api_key)
-    stream = client.responses.create(
+    client = _get_client(api_key)
+    response = client.responses.create(
         model=model,
         input=message,
-        stream=True
+        stream=False
     )
-    final_response = None
-    for event in stream:
-        if event.type == "response.output_text.delta":
-            pass
-        elif event.type == "response.completed":
-            final_response = event.response
-        elif event.type == "error":
-            pass
-
-
-    input_tokens = final_response.usage.input_tokens
-    output_tokens = final_response.usage.output_tokens
-    ai_text = final_response.output[0].content[0].text
+
+    input_tokens = response.usage.input_tokens
+    output_tokens = response.usage.output_tokens
+    ai_text = response.output[0].content[0].text
     return {
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
@@ -1,52 +1,217 @@
+import hashlib
+import logging
 import os
+import random
 import re
+import sqlite3
+import threading
 import time
-from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Iterable, Iterator, Tuple, Union
+from openai import APIConnectionError, InternalServerError, RateLimitError
 from . import openai_api
 
+# 批量翻译的请求/响应明细只在DEBUG级别输出，默认不格式化也不打印
+log = logging.getLogger(__name__)
+
+# 模块加载时预编译正则，避免每次调用都查找正则缓存
+_STRIP_PREFIX_RE = re.compile(r'^字幕\d+[:：]\s*')  # 批量翻译结果中的"字幕X："前缀
+_NON_CHINESE_RE = re.compile(r'[^\u4e00-\u9fff]+')
+
+
+# 翻译规则与提示词前缀均为固定字符串常量。
+# 接口的提示词缓存只对逐字节相同的前缀生效，并发发出的各批次共用同一前缀才能命中缓存，
+# 因此不要在这些常量中加入时间戳等随调用变化的内容，动态内容只追加在末尾。
+TRANSLATION_RULES = {
+    "双语": "你需要把用户提供的语言翻译成英文和中文，英文在上，中文在下",
+    "英文": "你需要把用户提供的语言翻译成英文",
+    "中文": "你需要把用户提供的语言翻译成中文",
+}
+
+_SYSTEM_PROMPTS = {
+    translation_type: f'你是一个翻译助手，翻译规则：\n{rule}'
+    for translation_type, rule in TRANSLATION_RULES.items()
+}
+
+# 每种翻译类型的系统消息只构造一次，各请求共用（只读，不会被修改）
+_SYSTEM_MESSAGES = {
+    translation_type: {'role': 'system', 'content': system_prompt}
+    for translation_type, system_prompt in _SYSTEM_PROMPTS.items()
+}
+
+_BATCH_PROMPT_HEADERS = {
+    "双语": "请翻译以下字幕文本，每条字幕都要按照翻译规则输出（英文在上，中文在下），然后用 ===NEXT=== 分隔下一条字幕的翻译结果：\n\n",
+    "英文": "请翻译以下字幕文本为英文，每条字幕的翻译结果用 ===NEXT=== 分隔：\n\n",
+    "中文": "请翻译以下字幕文本为中文，每条字幕的翻译结果用 ===NEXT=== 分隔：\n\n",
+}
+
+# 默认的翻译缓存数据库，多次运行之间复用已翻译的台词
+DEFAULT_CACHE_PATH = ".translation_cache.db"
+# 缓存格式版本，写在键里；写入规则变化时加一，旧版本写入的条目自然失效
+_CACHE_VERSION = 2
+
+# 限流(429)、连接失败/超时和服务端5xx错误才需要等待后重试
+_BACKOFF_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+def _backoff(error: Exception, attempt: int):
+    """对可恢复的接口错误做带随机抖动的指数退避，其他错误立即重试"""
+    if isinstance(error, _BACKOFF_ERRORS):
+        time.sleep(min(8, 0.5 * 2 ** attempt) + random.random() * 0.1)
+
+
+class TokenBucket:
+    """令牌桶限流器，限制每分钟的API请求数，多线程共享"""
+
+    def __init__(self, rpm: int):
+        self.capacity = rpm
+        self.tokens = float(rpm)
+        self.refill_rate = rpm / 60  # 每秒补充的令牌数
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.refill_rate
+            time.sleep(wait)
+
+
+class TranslationCache:
+    """翻译结果缓存：内存字典加可选的SQLite持久化，多线程共享"""
+
+    def __init__(self, path: str = None):
+        self._memory: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("CREATE TABLE IF NOT EXISTS t (k TEXT PRIMARY KEY, v TEXT)")
+            except sqlite3.Error as e:
+                print(f"打开翻译缓存失败，仅使用内存缓存: {str(e)}")
+                self._db = None
+
+    @staticmethod
+    def _key(model: str, translation_type: str, text: str) -> str:
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        return f"v{_CACHE_VERSION}|{model}|{translation_type}|{digest}"
+
+    def get(self, model: str, translation_type: str, text: str):
+        """查询缓存，未命中返回None"""
+        key = self._key(model, translation_type, text)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is None and self._db is not None:
+                try:
+                    row = self._db.execute("SELECT v FROM t WHERE k = ?", (key,)).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row is not None:
+                    value = self._memory[key] = row[0]
+        return value
+
+    def set_many(self, model: str, translation_type: str, pairs: List[Tuple[str, str]]):
+        """写入一批翻译结果，数据库中一个事务内完成"""
+        rows = [(self._key(model, translation_type, text), value) for text, value in pairs]
+        if not rows:
+            return
+        with self._lock:
+            self._memory.update(rows)
+            if self._db is not None:
+                try:
+                    with self._db:
+                        self._db.executemany("INSERT OR REPLACE INTO t (k, v) VALUES (?, ?)", rows)
+                except sqlite3.Error as e:
+                    print(f"写入翻译缓存失败: {str(e)}")
+
+
+# 按数据库路径共享的缓存实例，同一进程中的多个翻译器共用
+_caches: Dict[str, TranslationCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(path: str) -> TranslationCache:
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = TranslationCache(path)
+        return cache
+
 
 class SubtitleTranslator:
-    def __init__(self):
-        self.translation_rules_dict = {
-            "双语": "你需要把用户提供的语言翻译成英文和中文，英文在上，中文在下",
-            "英文": "你需要把用户提供的语言翻译成英文",
-            "中文": "你需要把用户提供的语言翻译成中文",
-        }
+    def __init__(self, rpm: int = 60, max_concurrency: int = 8,
+                 cache_path: str = DEFAULT_CACHE_PATH):
+        # 所有翻译请求共用的限流器，替代固定的sleep间隔
+        self.rate_limiter = TokenBucket(rpm)
+        # 逐条翻译时同时进行的请求数
+        self.max_concurrency = max_concurrency
+        self.translation_rules_dict = TRANSLATION_RULES
+        # cache_path为None时只缓存在内存中，不落盘
+        self._cache = _get_cache(cache_path) if cache_path else TranslationCache()
 
     # 解析SRT字幕文件内容
-    def parse_srt(self, srt_content: str) -> List[Dict]:
-        """解析SRT字幕文件内容"""
-        # 按空行分割字幕块
-        blocks = re.split(r'\n\s*\n', srt_content.strip())
-        subtitles = []
-
-        for block in blocks:
-            if not block.strip():
-                continue
-
-            lines = block.strip().split('\n')
-            if len(lines) < 3:
-                continue
-
-            # 提取序号
-            try:
-                index = int(lines[0])
-            except ValueError:
-                continue
+    def parse_srt(self, srt_content: Union[str, Iterable[str]]) -> List[Dict]:
+        """解析SRT字幕文件内容，也可以直接传入打开的文件对象逐行读取"""
+        # 字符串和文件对象都只按换行符分行，不使用splitlines以免在\x0c、\u2028等字符处断行
+        if isinstance(srt_content, str):
+            lines = (line.rstrip('\r') for line in srt_content.split('\n'))
+        else:
+            lines = (line.rstrip('\n').rstrip('\r') for line in srt_content)
 
-            # 提取时间轴
-            time_line = lines[1]
-            if '-->' not in time_line:
+        # 单次逐行扫描的状态机：0=等待序号 1=等待时间轴 2=收集文本 3=跳过无效块的剩余行
+        subtitles = []
+        state = 0
+        index = None
+        time_line = None
+        text_lines = []
+
+        for line in lines:
+            if not line.strip():
+                # 空行结束当前字幕块，缺少文本的块直接丢弃
+                if state == 2 and text_lines:
+                    subtitles.append({
+                        'index': index,
+                        'timeline': time_line,
+                        'text': '\n'.join(text_lines).rstrip()
+                    })
+                state = 0
+                text_lines = []
                 continue
 
-            # 提取文本内容（可能多行）
-            text_lines = lines[2:]
-            text = '\n'.join(text_lines)
+            if state == 0:
+                # 提取序号
+                line = line.strip()
+                if line.isdecimal():
+                    index = int(line)
+                    state = 1
+                else:
+                    state = 3
+            elif state == 1:
+                # 提取时间轴
+                if '-->' in line:
+                    time_line = line
+                    state = 2
+                else:
+                    state = 3
+            elif state == 2:
+                # 提取文本内容（可能多行）
+                text_lines.append(line)
 
+        # 文件末尾没有空行时补上最后一个字幕块
+        if state == 2 and text_lines:
             subtitles.append({
                 'index': index,
                 'timeline': time_line,
-                'text': text
+                'text': '\n'.join(text_lines).rstrip()
             })
 
         return subtitles
@@ -55,31 +220,27 @@ class SubtitleTranslator:
     def translate_single_text(self, api_key: str, model: str, text: str,
                               translation_type: str, max_retries: int = 3) -> str:
         """翻译单条字幕文本"""
-        system_prompt = f'你是一个翻译助手，翻译规则：\n{self.translation_rules_dict[translation_type]}'
-
-        message = [
-            {
-                'role': 'system',
-                'content': system_prompt,
-            },
-            {
-                "role": "user",
-                "content": text,
-            }
-        ]
+        cached = self._cache.get(model, translation_type, text)
+        if cached is not None:
+            return cached
+
+        message = [_SYSTEM_MESSAGES[translation_type], {"role": "user", "content": text}]
 
         # 重试机制
         for attempt in range(max_retries):
             try:
+                self.rate_limiter.acquire()
                 result = openai_api.text_to_text(api_key=api_key, message=message, model=model)
-                return result['ai_text'].strip()
+                translated_text = result['ai_text'].strip()
+                self._cache_results(model, translation_type, [text], [translated_text])
+                return translated_text
 
             except Exception as e:
                 print(f"翻译失败，尝试第 {attempt + 1} 次，错误：{str(e)}")
                 if attempt == max_retries - 1:
                     print(f"翻译失败，已达到最大重试次数，返回原文")
                     return text
-                time.sleep(1)  # 等待1秒后重试
+                _backoff(e, attempt)
 
         return text
     # 批量翻译文本
@@ -89,61 +250,56 @@ class SubtitleTranslator:
         if not texts:
             return []
 
+        # 先查缓存，只把未翻译过的文本发给接口，结果按原位置合并
+        results = [self._cache.get(model, translation_type, text) for text in texts]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        if len(missing) < len(texts):
+            translated_missing = self.translate_texts_batch(
+                api_key, model, [texts[i] for i in missing], translation_type, max_retries
+            )
+            for i, translated_text in zip(missing, translated_missing):
+                results[i] = translated_text
+            return results
+
         # 如果只有1条字幕，直接逐条翻译
         if len(texts) <= 1:
             return self._translate_one_by_one(api_key, model, texts, translation_type, max_retries)
 
         # 使用编号格式进行批量翻译
-        system_prompt = f'你是一个翻译助手，翻译规则：\n{self.translation_rules_dict[translation_type]}'
+        # 构造带编号的文本，每条单独翻译；固定前缀在前，字幕内容追加在后
+        prompt_parts = [_BATCH_PROMPT_HEADERS[translation_type]]
+        prompt_parts.extend(f"字幕{i}：{text}\n\n" for i, text in enumerate(texts, 1))
+        user_prompt = ''.join(prompt_parts)
 
-        # 构造带编号的文本，每条单独翻译
-        if translation_type == "双语":
-            user_prompt = "请翻译以下字幕文本，每条字幕都要按照翻译规则输出（英文在上，中文在下），然后用 ===NEXT=== 分隔下一条字幕的翻译结果：\n\n"
-        else:
-            user_prompt = f"请翻译以下字幕文本为{translation_type}，每条字幕的翻译结果用 ===NEXT=== 分隔：\n\n"
-
-        for i, text in enumerate(texts, 1):
-            user_prompt += f"字幕{i}：{text}\n\n"
-
-        message = [
-            {
-                'role': 'system',
-                'content': system_prompt,
-            },
-            {
-                "role": "user",
-                "content": user_prompt,
-            }
-        ]
+        message = [_SYSTEM_MESSAGES[translation_type], {"role": "user", "content": user_prompt}]
 
-        print(f"发送给AI的文本：")
-        print(f"系统提示：{system_prompt}")
-        print(f"用户输入：{user_prompt}")
-        print("=" * 50)
+        log.debug("发送给AI的文本：\n系统提示：%s\n用户输入：%s", _SYSTEM_PROMPTS[translation_type], user_prompt)
 
         # 重试机制
         for attempt in range(max_retries):
             try:
+                self.rate_limiter.acquire()
                 result = openai_api.text_to_text(api_key=api_key, message=message, model=model)
                 translated_text = result['ai_text']
 
-                print(f"AI返回的原始结果：")
-                print(f"'{translated_text}'")
-                print("=" * 50)
+                log.debug("AI返回的原始结果：'%s'", translated_text)
 
                 # 解析翻译结果
                 translated_parts = self._parse_batch_translation(translated_text, len(texts))
 
-                print(f"解析后的结果数量：{len(translated_parts)}, 期望数量：{len(texts)}")
-                for i, part in enumerate(translated_parts):
-                    print(f"第{i + 1}部分：'{part}'")
-                print("=" * 50)
+                log.debug("解析后的结果数量：%d, 期望数量：%d", len(translated_parts), len(texts))
 
                 if len(translated_parts) >= len(texts) - 1:  # 允许少1个的容错
+                    # 数量完全一致才写缓存；数量不符时条目可能错位，只返回不缓存
+                    if len(translated_parts) == len(texts):
+                        self._cache_results(model, translation_type, texts, translated_parts)
                     # 如果翻译结果少了，用原文补齐
                     while len(translated_parts) < len(texts):
                         translated_parts.append(texts[len(translated_parts)])
-                    return translated_parts[:len(texts)]  # 确保不超过原始数量
+                    translated_parts = translated_parts[:len(texts)]  # 确保不超过原始数量
+                    return translated_parts
                 else:
                     print(f"批量翻译结果数量不匹配，改为逐条翻译")
                     return self._translate_one_by_one(api_key, model, texts, translation_type, max_retries)
@@ -153,61 +309,133 @@ class SubtitleTranslator:
                 if attempt == max_retries - 1:
                     print(f"批量翻译失败，改为逐条翻译")
                     return self._translate_one_by_one(api_key, model, texts, translation_type, max_retries)
-                time.sleep(1)
+                _backoff(e, attempt)
 
         return texts
 
+    # 写入翻译缓存
+    def _cache_results(self, model: str, translation_type: str, texts: List[str],
+                       translated_texts: List[str]):
+        """写入翻译缓存，与原文相同的结果多半是翻译失败后的回退，不缓存"""
+        self._cache.set_many(model, translation_type, [
+            (text, translated_text)
+            for text, translated_text in zip(texts, translated_texts)
+            if translated_text != text
+        ])
+
     # 解析批量翻译结果
     def _parse_batch_translation(self, translated_text: str, expected_count: int) -> List[str]:
         """解析批量翻译结果"""
-        print(f"开始解析翻译结果，期望得到 {expected_count} 个部分")
+        log.debug("开始解析翻译结果，期望得到 %d 个部分", expected_count)
 
         # 按分隔符分割
         parts = translated_text.split('===NEXT===')
-        print(f"按 '===NEXT===' 分割后得到 {len(parts)} 个部分：")
-        for i, part in enumerate(parts):
-            print(f"  部分{i}: '{part.strip()}'")
+        log.debug("按 '===NEXT===' 分割后得到 %d 个部分", len(parts))
 
         # 清理每个部分
         cleaned_parts = []
         for part in parts:
             cleaned = part.strip()
             if cleaned:
-                # 移除"字幕X："前缀，保留翻译内容
-                cleaned = re.sub(r'^字幕\d+[:：]\s*', '', cleaned)
-                cleaned = cleaned.strip()
+                # 移除"字幕X："前缀，保留翻译内容；没有前缀时不走正则
+                if cleaned.startswith('字幕'):
+                    cleaned = _STRIP_PREFIX_RE.sub('', cleaned).strip()
 
                 if cleaned:
                     cleaned_parts.append(cleaned)
 
-        print(f"清理后得到 {len(cleaned_parts)} 个有效部分：")
-        for i, part in enumerate(cleaned_parts):
-            print(f"  清理后部分{i}: '{part}'")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("清理后得到 %d 个有效部分：", len(cleaned_parts))
+            for i, part in enumerate(cleaned_parts):
+                log.debug("  清理后部分%d: '%s'", i, part)
 
         return cleaned_parts
 
     # 逐条翻译作为备用方案
     def _translate_one_by_one(self, api_key: str, model: str, texts: List[str],
                               translation_type: str, max_retries: int) -> List[str]:
-        """逐条翻译作为备用方案"""
-        translated_results = []
+        """逐条翻译作为备用方案，各条并发请求，结果保持原顺序"""
+        if not texts:
+            return []
 
-        for i, text in enumerate(texts):
+        def translate_one(i: int, text: str) -> str:
             print(f"  正在翻译第 {i + 1}/{len(texts)} 条...")
-            translated_text = self.translate_single_text(
+            return self.translate_single_text(
                 api_key=api_key,
                 model=model,
                 text=text,
                 translation_type=translation_type,
                 max_retries=max_retries
             )
-            translated_results.append(translated_text)
 
-            # 避免API请求过频
-            if i < len(texts) - 1:
-                time.sleep(0.3)
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(texts))) as executor:
+            futures = [executor.submit(translate_one, i, text) for i, text in enumerate(texts)]
+            return [future.result() for future in futures]
+
+    # 按条数选择批量或逐条翻译
+    def translate_texts(self, api_key: str, model: str, texts: List[str],
+                        translation_type: str, batch_min: int = 1) -> List[str]:
+        """翻译一批文本，条数少于 batch_min 时改为逐条翻译"""
+        if len(texts) >= batch_min:
+            return self.translate_texts_batch(
+                api_key=api_key,
+                model=model,
+                texts=texts,
+                translation_type=translation_type
+            )
+
+        # 如果批次太小，逐条翻译
+        return self._translate_one_by_one(
+            api_key=api_key,
+            model=model,
+            texts=texts,
+            translation_type=translation_type,
+            max_retries=3
+        )
+
+    # 分批并发翻译
+    def translate_batches(self, api_key: str, model: str, texts: List[str], translation_type: str,
+                          batch_size: int, batch_min: int = 1, max_workers: int = 8) -> List[str]:
+        """
+        分批并发翻译文本，请求频率由限流器控制
+
+        Args:
+            batch_size: 每批翻译的字幕条数
+            batch_min: 批次条数少于该值时改为逐条翻译
+            max_workers: 同时进行的翻译批次数
+
+        Returns:
+            与 texts 顺序一致的翻译结果
+        """
+        # 相同文本只翻译一次，翻译后再按原位置映射回去
+        unique = {}
+        for text in texts:
+            unique.setdefault(text, len(unique))
+        unique_texts = list(unique)
+
+        batches = [unique_texts[i:i + batch_size] for i in range(0, len(unique_texts), batch_size)]
+        total_batches = len(batches)
+
+        def translate_batch(batch_index: int, batch_texts: List[str]) -> List[str]:
+            print(f"正在翻译第 {batch_index + 1}/{total_batches} 批次，包含 {len(batch_texts)} 条字幕...")
+            translated_batch = self.translate_texts(api_key, model, batch_texts, translation_type, batch_min)
+            print(f"第 {batch_index + 1} 批次翻译完成")
+            return translated_batch
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(translate_batch, batch_index, batch_texts): batch_index
+                for batch_index, batch_texts in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
 
-        return translated_results
+        # 按批次顺序重新拼接
+        translated_unique = []
+        for batch_index in range(total_batches):
+            translated_unique.extend(results[batch_index])
+        return [translated_unique[unique[text]] for text in texts]
 
     # 格式化翻译后的字幕
     def format_translated_subtitle(self, original_text: str, translated_text: str,
@@ -234,26 +462,31 @@ class SubtitleTranslator:
     # 判断文本是否主要包含中文
     def _is_chinese(self, text: str) -> bool:
         """判断文本是否主要包含中文"""
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        total_chars = len(re.sub(r'\s', '', text))
-        return chinese_chars > total_chars * 0.3 if total_chars > 0 else False
+        # 删掉非中文字符后的长度即中文字符数，不生成逐字符的匹配列表
+        chinese_chars = len(_NON_CHINESE_RE.sub('', text))
+        total_chars = len(''.join(text.split()))
+        # 两边同乘10，用整数比较代替浮点乘法
+        return total_chars > 0 and chinese_chars * 10 > total_chars * 3
     # 生成SRT格式的字幕
     def generate_srt(self, subtitles: List[Dict]) -> str:
         """生成SRT格式的字幕"""
-        srt_content = []
+        return ''.join(self.generate_srt_iter(subtitles))
 
+    # 逐条生成SRT格式的字幕
+    def generate_srt_iter(self, subtitles: List[Dict]) -> Iterator[str]:
+        """逐条产出SRT字幕块，可直接交给 writelines 写入文件而无需拼出整个字符串"""
+        separator = ''
         for subtitle in subtitles:
-            srt_content.append(str(subtitle['index']))
-            srt_content.append(subtitle['timeline'])
-            srt_content.append(subtitle['text'])
-            srt_content.append('')  # 空行分隔
-
-        return '\n'.join(srt_content)
+            # 字幕块之间以空行分隔，最后一块后不再追加空行
+            yield f"{separator}{subtitle['index']}\n{subtitle['timeline']}\n{subtitle['text']}\n"
+            separator = '\n'
 
 # 翻译SRT字幕文件
 def translate_srt_file(api_key: str, model: str, srt_file_path: str,
                        output_folder: str = "output", translation_type: str = "中文",
-                       batch_size: int = 50) -> str:
+                       batch_size: int = 50, max_workers: int = 8,
+                       translator: SubtitleTranslator = None,
+                       cache_path: str = DEFAULT_CACHE_PATH) -> str:
     """
     翻译SRT字幕文件
 
@@ -264,11 +497,15 @@ def translate_srt_file(api_key: str, model: str, srt_file_path: str,
         output_folder: 输出文件夹路径
         translation_type: 翻译类型（双语、英文、中文）
         batch_size: 每次翻译的字幕条数
+        max_workers: 同时进行的翻译批次数
+        translator: 共用的翻译器（限流器和缓存），不传则新建
+        cache_path: 新建翻译器时使用的缓存数据库路径，None表示不落盘
 
     Returns:
         输出文件的完整路径
     """
-    translator = SubtitleTranslator()
+    if translator is None:
+        translator = SubtitleTranslator(cache_path=cache_path)
 
     # 检查翻译类型是否支持
     if translation_type not in translator.translation_rules_dict:
@@ -278,55 +515,39 @@ def translate_srt_file(api_key: str, model: str, srt_file_path: str,
     if not os.path.exists(srt_file_path):
         raise FileNotFoundError(f"SRT文件不存在：{srt_file_path}")
 
+    # 逐行解析SRT文件，不把整个文件先读入内存
     with open(srt_file_path, 'r', encoding='utf-8') as file:
-        srt_content = file.read()
-
-    # 解析SRT文件
-    subtitles = translator.parse_srt(srt_content)
+        subtitles = translator.parse_srt(file)
     if not subtitles:
         raise ValueError("无法解析SRT文件或文件为空")
 
     print(f"成功解析 {len(subtitles)} 条字幕")
 
-    # 分批翻译
+    # 分批并发翻译
+    translated_texts = translator.translate_batches(
+        api_key=api_key,
+        model=model,
+        texts=[sub['text'] for sub in subtitles],
+        translation_type=translation_type,
+        batch_size=batch_size,
+        max_workers=max_workers
+    )
+
+    # 格式化翻译结果
     translated_subtitles = []
-    total_batches = (len(subtitles) + batch_size - 1) // batch_size
-
-    for i in range(0, len(subtitles), batch_size):
-        batch_subtitles = subtitles[i:i + batch_size]
-        batch_texts = [sub['text'] for sub in batch_subtitles]
+    for j, subtitle in enumerate(subtitles):
+        original_text = subtitle['text']
+        translated_text = translated_texts[j] if j < len(translated_texts) else original_text
 
-        current_batch = i // batch_size + 1
-        print(f"正在翻译第 {current_batch}/{total_batches} 批次，包含 {len(batch_texts)} 条字幕...")
-
-        # 翻译当前批次
-        translated_texts = translator.translate_texts_batch(
-            api_key=api_key,
-            model=model,
-            texts=batch_texts,
-            translation_type=translation_type
+        formatted_text = translator.format_translated_subtitle(
+            original_text, translated_text, translation_type
         )
 
-        # 格式化翻译结果
-        for j, subtitle in enumerate(batch_subtitles):
-            original_text = subtitle['text']
-            translated_text = translated_texts[j] if j < len(translated_texts) else original_text
-
-            formatted_text = translator.format_translated_subtitle(
-                original_text, translated_text, translation_type
-            )
-
-            translated_subtitles.append({
-                'index': subtitle['index'],
-                'timeline': subtitle['timeline'],
-                'text': formatted_text
-            })
-
-        print(f"第 {current_batch} 批次翻译完成")
-
-        # 避免API请求过频
-        if current_batch < total_batches:
-            time.sleep(0.5)
+        translated_subtitles.append({
+            'index': subtitle['index'],
+            'timeline': subtitle['timeline'],
+            'text': formatted_text
+        })
 
     # 生成输出文件名
     input_filename = os.path.basename(srt_file_path)
@@ -337,11 +558,45 @@ def translate_srt_file(api_key: str, model: str, srt_file_path: str,
     os.makedirs(output_folder, exist_ok=True)
     output_path = os.path.join(output_folder, output_filename)
 
-    # 生成并保存翻译后的SRT文件
-    translated_srt_content = translator.generate_srt(translated_subtitles)
-
-    with open(output_path, 'w', encoding='utf-8') as file:
-        file.write(translated_srt_content)
+    # 逐条生成并保存翻译后的SRT文件
+    with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as file:
+        file.writelines(translator.generate_srt_iter(translated_subtitles))
 
     print(f"翻译完成，输出文件：{output_path}")
-    return output_path
\ No newline at end of file
+    return output_path
+
+
+# 批量翻译多个SRT字幕文件
+def batch_translate_srt_files(api_key: str, model: str, srt_file_paths: List[str],
+                              output_folder: str = "output", translation_type: str = "中文",
+                              batch_size: int = 50, max_workers: int = 4,
+                              cache_path: str = DEFAULT_CACHE_PATH) -> List[str]:
+    """
+    并发翻译多个SRT字幕文件
+
+    各文件在线程池中同时读取、翻译和写出，共用同一个翻译器，
+    请求频率仍由同一个限流器控制。
+
+    Args:
+        srt_file_paths: SRT文件路径列表
+        max_workers: 同时处理的文件数
+        其余参数同 translate_srt_file
+
+    Returns:
+        与 srt_file_paths 顺序一致的输出文件路径，翻译失败的文件为 None
+    """
+    if not srt_file_paths:
+        return []
+
+    translator = SubtitleTranslator(cache_path=cache_path)
+
+    def translate_one(srt_file_path: str) -> str:
+        try:
+            return translate_srt_file(api_key, model, srt_file_path, output_folder,
+                                      translation_type, batch_size, translator=translator)
+        except Exception as e:
+            print(f"翻译失败：{srt_file_path}，错误：{str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(srt_file_paths))) as executor:
+        return list(executor.map(translate_one, srt_file_paths))
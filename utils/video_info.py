@@ -1,8 +1,30 @@
 import os
 import json
+import shlex
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 项目自带的ffmpeg/ffprobe路径，导入时计算一次
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+_FFMPEG_PATH = str(_PROJECT_ROOT / "ffmpeg" / "bin" / "ffmpeg.exe")
+_FFPROBE_PATH = str(_PROJECT_ROOT / "ffmpeg" / "bin" / "ffprobe.exe")
+
+# 把ffmpeg参数列表格式化为命令行字符串，用于出错时的诊断信息
+def _format_command(cmd):
+    """把参数列表转成可直接复制到终端执行的命令行，带空格或引号的参数会正确转义"""
+    if os.name == "nt":
+        return subprocess.list2cmdline(cmd)
+    # 等同于shlex.join，兼容Python 3.7
+    return " ".join(shlex.quote(arg) for arg in cmd)
+
+
 # 将字幕文件内嵌到视频中
 def embed_subtitles(video_path, subtitle_files, output_path, preserve_ass_styles=True):
     print(subtitle_files)
@@ -35,7 +57,10 @@ def embed_subtitles(video_path, subtitle_files, output_path, preserve_ass_styles
         if not subtitle_files:
             return {"success": False, "error": "字幕文件列表为空"}
 
-        # 检查字幕文件格式和存在性
+        # 检查字幕文件格式和存在性，同时生成字幕输入、流映射和元数据参数
+        subtitle_inputs = []
+        subtitle_maps = []
+        has_ass_subtitles = False
         for i, sub_info in enumerate(subtitle_files):
             if not isinstance(sub_info, dict):
                 return {"success": False, "error": f"字幕文件 {i + 1} 格式错误，应为字典格式"}
@@ -47,25 +72,31 @@ def embed_subtitles(video_path, subtitle_files, output_path, preserve_ass_styles
             if not os.path.exists(sub_path):
                 return {"success": False, "error": f"字幕文件不存在: {sub_path}"}
 
+            has_ass_subtitles = has_ass_subtitles or sub_path.lower().endswith('.ass')
+            subtitle_inputs += ["-i", sub_path]
+            subtitle_maps += ["-map", f"{i + 1}"]  # 映射每个字幕文件
+
+            # 设置语言元数据
+            if sub_info.get("language"):
+                subtitle_maps += [f"-metadata:s:s:{i}", f"language={sub_info['language']}"]
+
+            # 设置标题元数据
+            if sub_info.get("title"):
+                subtitle_maps += [f"-metadata:s:s:{i}", f"title={sub_info['title']}"]
+
         # 检查输出路径
         if not output_path:
             return {"success": False, "error": "输出文件夹路径不能为空"}
 
-        # 获取ffmpeg的相对路径
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(current_dir)
-        ffmpeg_path = os.path.join(project_root, "ffmpeg", "bin", "ffmpeg.exe")
-
         # 检查ffmpeg是否存在
-        if not os.path.exists(ffmpeg_path):
-            return {"success": False, "error": f"ffmpeg不存在: {ffmpeg_path}"}
+        if not os.path.exists(_FFMPEG_PATH):
+            return {"success": False, "error": f"ffmpeg不存在: {_FFMPEG_PATH}"}
 
         # 确保输出目录存在
-        if not os.path.exists(output_path):
-            try:
-                os.makedirs(output_path, exist_ok=True)
-            except Exception as e:
-                return {"success": False, "error": f"无法创建输出目录: {e}"}
+        try:
+            os.makedirs(output_path, exist_ok=True)
+        except Exception as e:
+            return {"success": False, "error": f"无法创建输出目录: {e}"}
 
         # 生成输出文件路径 - 保持原始格式
         video_name = os.path.splitext(os.path.basename(video_path))[0]
@@ -73,9 +104,6 @@ def embed_subtitles(video_path, subtitle_files, output_path, preserve_ass_styles
         output_file_path = os.path.join(output_path, f"{video_name}_with_subtitles{video_ext}")
 
         # 根据视频格式选择合适的字幕编码
-        # 检查是否有ASS字幕文件
-        has_ass_subtitles = any(sub_info["path"].lower().endswith('.ass') for sub_info in subtitle_files)
-
         # 根据容器格式和字幕类型选择编码方式
         if preserve_ass_styles and video_ext.lower() in ['.mkv', '.avi', '.mov'] and has_ass_subtitles:
             # MKV/AVI/MOV容器且有ASS字幕，保持ASS格式以保留样式
@@ -87,30 +115,20 @@ def embed_subtitles(video_path, subtitle_files, output_path, preserve_ass_styles
             # 其他情况使用srt格式
             subtitle_codec = "srt"
 
-        # 构建ffmpeg命令
-        cmd = [ffmpeg_path]
+        # 构建ffmpeg命令（-nostdin 避免ffmpeg读取标准输入）
+        cmd = [_FFMPEG_PATH, "-nostdin"]
 
         # 添加视频输入
         cmd.extend(["-i", video_path])
 
         # 添加所有字幕文件作为输入
-        for sub_info in subtitle_files:
-            cmd.extend(["-i", sub_info["path"]])
+        cmd.extend(subtitle_inputs)
 
         # 映射视频和音频流
         cmd.extend(["-map", "0"])  # 映射第一个输入的所有流（视频+音频）
 
         # 映射字幕流并设置元数据
-        for i, sub_info in enumerate(subtitle_files):
-            cmd.extend(["-map", f"{i + 1}"])  # 映射每个字幕文件
-
-            # 设置语言元数据
-            if sub_info.get("language"):
-                cmd.extend([f"-metadata:s:s:{i}", f"language={sub_info['language']}"])
-
-            # 设置标题元数据
-            if sub_info.get("title"):
-                cmd.extend([f"-metadata:s:s:{i}", f"title={sub_info['title']}"])
+        cmd.extend(subtitle_maps)
 
         # 编码设置
         cmd.extend(["-c", "copy"])  # 复制所有流
@@ -134,7 +152,7 @@ def embed_subtitles(video_path, subtitle_files, output_path, preserve_ass_styles
             return {
                 "success": False,
                 "error": f"ffmpeg执行失败: {result.stderr}",
-                "command": " ".join(cmd)
+                "command": _format_command(cmd)
             }
 
         # 检查输出文件是否创建成功
@@ -155,6 +173,42 @@ def embed_subtitles(video_path, subtitle_files, output_path, preserve_ass_styles
     except Exception as e:
         return {"success": False, "error": f"内嵌字幕时出错: {str(e)}"}
 
+# 批量将字幕文件内嵌到多个视频中
+def batch_embed(jobs, max_workers=4):
+    """
+    并发执行多个内嵌字幕任务
+
+    每个任务启动一个ffmpeg子进程，流复制几乎不占CPU，主要受磁盘带宽限制，
+    因此默认最多同时运行4个。
+
+    Args:
+        jobs (list): 任务列表，每个元素是 embed_subtitles 的关键字参数字典
+        max_workers (int): 最大并发任务数
+
+    Returns:
+        list: 与 jobs 顺序一致的 embed_subtitles 结果列表
+    """
+    if not jobs:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        return list(executor.map(lambda job: embed_subtitles(**job), jobs))
+
+_SIZE_UNITS = ("B", "KB", "MB", "GB")
+
+# 将字节数转换为易读的大小字符串
+def _human_bytes(size_bytes):
+    """按1024逐级换算到 B/KB/MB/GB，不足1KB时保留整数字节数"""
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+
+    size = size_bytes
+    unit_index = 0
+    while size >= 1024 and unit_index < len(_SIZE_UNITS) - 1:
+        size /= 1024
+        unit_index += 1
+    return f"{size:.2f} {_SIZE_UNITS[unit_index]}"
+
 # 获取视频文件的详细信息
 def get_video_info(video_path):
     """
@@ -171,18 +225,13 @@ def get_video_info(video_path):
         if not os.path.exists(video_path):
             return {"error": f"视频文件不存在: {video_path}"}
 
-        # 获取ffprobe的相对路径
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(current_dir)
-        ffprobe_path = os.path.join(project_root, "ffmpeg", "bin", "ffprobe.exe")
-
         # 检查ffprobe是否存在
-        if not os.path.exists(ffprobe_path):
-            return {"error": f"ffprobe不存在: {ffprobe_path}"}
+        if not os.path.exists(_FFPROBE_PATH):
+            return {"error": f"ffprobe不存在: {_FFPROBE_PATH}"}
 
         # 构建ffprobe命令
         cmd = [
-            ffprobe_path,
+            _FFPROBE_PATH,
             '-v', 'quiet',
             '-print_format', 'json',
             '-show_format',
@@ -191,13 +240,13 @@ def get_video_info(video_path):
         ]
 
         # 执行命令
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+        result = subprocess.run(cmd, capture_output=True)
 
         if result.returncode != 0:
-            return {"error": f"ffprobe执行失败: {result.stderr}"}
+            return {"error": f"ffprobe执行失败: {result.stderr.decode('utf-8', errors='ignore')}"}
 
-        # 解析JSON输出
-        probe_data = json.loads(result.stdout)
+        # 解析JSON输出（直接解析UTF-8字节）
+        probe_data = _json_loads(result.stdout)
 
         # 提取视频流信息
         video_stream = None
@@ -244,15 +293,7 @@ def get_video_info(video_path):
         # 转换文件大小为更易读的格式
         if video_info["video_size"] != 'Unknown':
             try:
-                size_bytes = int(video_info["video_size"])
-                if size_bytes < 1024:
-                    video_info["video_size_formatted"] = f"{size_bytes} B"
-                elif size_bytes < 1024 * 1024:
-                    video_info["video_size_formatted"] = f"{size_bytes / 1024:.2f} KB"
-                elif size_bytes < 1024 * 1024 * 1024:
-                    video_info["video_size_formatted"] = f"{size_bytes / (1024 * 1024):.2f} MB"
-                else:
-                    video_info["video_size_formatted"] = f"{size_bytes / (1024 * 1024 * 1024):.2f} GB"
+                video_info["video_size_formatted"] = _human_bytes(int(video_info["video_size"]))
             except:
                 video_info["video_size_formatted"] = "Unknown"
 